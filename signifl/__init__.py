@@ -17,6 +17,7 @@
 """
 
 
+from types import SimpleNamespace as _SimpleNamespace
 import numpy as _np
 
 
@@ -28,6 +29,36 @@ def _np_float_type(val):
     return val.dtype
 
 
+_FLOAT_CONSTS = {}
+
+
+def _float_consts(val_type):
+    """Return the constants needed for a NumPy binary float type
+
+    They are computed only once per type, as np.finfo is relatively slow.
+    The integer type has native byte order, as do the arrays it views. It is
+    None for types that are not plain IEEE 754 formats of 2, 4, or 8 bytes,
+    such as x87 extended precision, which has an explicit integer bit.
+
+    """
+    val_type = val_type.newbyteorder('=')
+    consts = _FLOAT_CONSTS.get(val_type)
+    if consts is None:
+        finfo = _np.finfo(val_type)
+        consts = _FLOAT_CONSTS[val_type] = _SimpleNamespace(
+            nmant=finfo.nmant, maxexp=finfo.maxexp, minexp=finfo.minexp,
+            tiny=finfo.tiny, eps=finfo.eps, int_type=None)
+        if (val_type.itemsize in (2, 4, 8) and
+                8 * val_type.itemsize == 1 + finfo.nexp + finfo.nmant):
+            int_type = _np.dtype('i' + str(val_type.itemsize))
+            consts.int_type = int_type
+            consts.bias = finfo.maxexp - 1  # exponent offset
+            consts.mant_mask = int_type.type(2 ** finfo.nmant - 1)
+            consts.exp_mask = int_type.type(2 ** finfo.nexp - 1 << finfo.nmant)
+            consts.abs_mask = int_type.type(_np.iinfo(int_type).max)
+    return consts
+
+
 def _decompose(val):
     """Decompose floats into negative, exponent, and significand
 
@@ -35,29 +66,142 @@ def _decompose(val):
 
     """
     val_type = _np_float_type(val)
-    finfo = _np.finfo(val_type)
-    negative = _np.signbit(val)
-    int_type = _np.dtype('i' + str(val_type.itemsize))
-    val_int = _np.abs(val).view(int_type)  # discard sign (MSB now 0),
-                                           # view bit string as int
-    exponent = (val_int >> finfo.nmant)  # drop significand
-    exponent -= finfo.maxexp - 1  # correct exponent offset
-    significand = val_int & _np.array(2 ** finfo.nmant - 1, int_type)
-                        # second factor provides mask to extract significand
+    consts = _float_consts(val_type)
+    if consts.int_type is None:
+        raise TypeError("Argument must have an IEEE 754 binary float type of "
+                        "2, 4, or 8 bytes. Your argument has type ‘{}’."
+                        .format(val_type.name))
+    val = val.astype(val_type.newbyteorder('='), copy=False)  # for the view
+    val_int = val.view(consts.int_type)  # view bit string as int
+    negative = val_int < 0  # the sign bit is the MSB
+    val_int = val_int & consts.abs_mask  # discard sign (MSB now 0)
+    exponent = (val_int >> consts.nmant)  # drop significand
+    exponent = exponent.astype(_np.intc, copy=False)  # few bits suffice
+    exponent -= consts.bias  # correct exponent offset
+    significand = val_int  # val_int is a fresh array, so we can reuse it
+    significand &= consts.mant_mask  # extract significand
     return (negative, exponent, significand)
 
 
+# De Bruijn multiplier and table for counting trailing zero bits, see
+# https://www.chessprogramming.org/BitScan#De_Bruijn_Multiplication
+_DEBRUIJN = 0x03f79d71b4cb0a89
+_DEBRUIJN_CTZ = _np.empty(64, _np.intc)
+_DEBRUIJN_CTZ[[(_DEBRUIJN << i) % 2 ** 64 >> 58
+               for i in range(64)]] = range(64)
+
+
+def _ctz(val_int):
+    """Count the trailing zero bits of positive integers
+
+    The lowest set bit is isolated with the v & -v trick, for which see
+    https://stackoverflow.com/questions/18806481. Multiplying it with a
+    De Bruijn sequence puts a unique pattern in the top six bits, which is
+    then looked up in a table.
+
+    """
+    lowest_bit = (val_int & -val_int).astype(_np.uint64)
+    lowest_bit *= _np.uint64(_DEBRUIJN)  # wraps around modulo 2 ** 64
+    lowest_bit >>= _np.uint64(58)
+    return _DEBRUIJN_CTZ[lowest_bit]
+
+
+def _floor_pow2(val):
+    """Round positive normal floats down to the nearest power of two
+
+    Clearing the significand bits leaves only the exponent, which is exactly
+    `2 ** floor(log2(val))` without calling any transcendental functions.
+    Types without a matching integer view fall back to that expression.
+
+    """
+    val_type = _np_float_type(val).newbyteorder('=')  # for the view
+    consts = _float_consts(val_type)
+    if consts.int_type is None:
+        return 2 ** _np.floor(_np.log2(val))
+    val = val.astype(val_type, copy=False)
+    return (val.view(consts.int_type) & consts.exp_mask).view(val_type)
+
+
+def _floor_log10_pow2(exponent):
+    """Compute ⌊log10(2 ** exponent)⌋ for integer exponents
+
+    78913 / 2 ** 18 approximates log10(2) closely enough for this integer
+    computation to be exact for all double precision powers of two.
+
+    """
+    return (exponent * 78913) >> 18
+
+
+# powers of ten for the decimal exponents of all double precision powers of two
+_POW10_MIN = _floor_log10_pow2(_np.finfo(_np.float64).minexp
+                               - _np.finfo(_np.float64).nmant)
+_POW10_MAX = _floor_log10_pow2(_np.finfo(_np.float64).maxexp)
+_POW10 = 10. ** _np.arange(_POW10_MIN, _POW10_MAX + 1)
+
+
+def _half_width(val_enc, multiplier):
+    """Compute the half-widths of the bounds on the non-encoded values"""
+    half_width = uncertainty_bound(val_enc)
+    half_width *= multiplier / 2
+    return half_width
+
+
+def _bounds_soa(val_enc, multiplier):
+    """Extract tightest bounds on the original, non-encoded values
+
+    The lower and upper bounds are returned as two separate arrays.
+
+    """
+    half_width = _half_width(val_enc, multiplier)
+    return (val_enc - half_width, val_enc + half_width)
+
+
 def _bounds(val_enc, multiplier):
-    """Extract tightest bounds on the original, non-encoded values"""
-    val_type = _np_float_type(val_enc)
-    unc_bnd = uncertainty_bound(val_enc)
+    """Extract tightest bounds as structured pairs of lower and upper ones"""
+    half_width = _half_width(val_enc, multiplier)
+    val_type = half_width.dtype
     pair = _np.dtype([('lower', val_type), ('upper', val_type)])
     bounds = _np.empty(val_enc.shape, pair)
-    bounds['lower'] = val_enc - multiplier * unc_bnd / 2
-    bounds['upper'] = val_enc + multiplier * unc_bnd / 2
+    _np.subtract(val_enc, half_width, out=bounds['lower'])
+    _np.add(val_enc, half_width, out=bounds['upper'])
     return bounds
 
 
+def _lower_bound(val_enc, multiplier):
+    """Extract lower bounds on the original, non-encoded values"""
+    lower = _half_width(val_enc, multiplier)
+    return _np.subtract(val_enc, lower, out=lower)
+
+
+def _upper_bound(val_enc, multiplier):
+    """Extract upper bounds on the original, non-encoded values"""
+    upper = _half_width(val_enc, multiplier)
+    return _np.add(val_enc, upper, out=upper)
+
+
+# chunk size for which encode's working arrays together stay in L2 cache
+_ENCODE_CHUNK_BYTES = 2 ** 18
+
+
+def _encode_chunk(val, unc, val_enc, consts):
+    """Encode a one-dimensional chunk of values into val_enc"""
+    # we will not change NaN or infinity, so compute with a harmless 1 there
+    val_isnum = _np.isfinite(val)
+    val_enc[...] = 1
+    _np.abs(val, out=val_enc, where=val_isnum)  # remove sign
+    # avoid uncs that are too small or NaN; then use maximal precision
+    unc_bnd = _np.multiply(val_enc, 2 * consts.eps)
+    _np.fmax(unc_bnd, 2 * consts.tiny, out=unc_bnd)
+    _np.fmax(_np.abs(unc), unc_bnd, out=unc_bnd)  # unc is one-sided
+    unc_bnd = _floor_pow2(unc_bnd)
+    _np.divide(val_enc, unc_bnd, out=val_enc)
+    _np.floor(val_enc, out=val_enc)
+    val_enc += .5  # (2·⌊x/δ⌋+1)·δ/2 = (⌊x/δ⌋+½)·δ
+    val_enc *= unc_bnd
+    _np.copysign(val_enc, val, out=val_enc)  # restore sign
+    _np.copyto(val_enc, val, where=~val_isnum)
+
+
 def encode(val, unc):
     """Encode floats into convention format
 
@@ -96,24 +240,17 @@ def encode(val, unc):
     val_type = _np_float_type(val)
     if _np_float_type(unc) != val_type:
         unc = _np.array(unc, val_type)
-    val_enc = _np.copy(val)
-    unc_bnd = _np.copy(unc)
-    finfo = _np.finfo(val_type)
-    unc_bnd = _np.abs(unc)  # unc is assumed to be one-sided
-    if _np.isscalar(unc_bnd):
-        unc_bnd = unc_bnd * _np.ones(val_enc.shape)
-    val_isneg = _np.signbit(val)
-    val_enc[val_isneg] *= -1  # remove sign
-    # we will not change NaN or infinity
-    val_isnum = ~(_np.isnan(val) | _np.isinf(val))
-    # avoid uncs that are too small or NaN; then use maximal precision
-    unc_bnd = _np.fmax(unc_bnd[val_isnum],
-                       2 * _np.fmax(finfo.tiny, val_enc[val_isnum] * finfo.eps))
-    unc_bnd = 2 ** _np.floor(_np.log2(unc_bnd))
-    val_enc[val_isnum] = ((2 * _np.floor(val_enc[val_isnum] / unc_bnd) + 1)
-                          * unc_bnd / 2)
-    val_enc[val_isneg] *= -1  # restore sign
-    return val_enc
+    consts = _float_consts(val_type)
+    # the iterator broadcasts and hands out cache-sized one-dimensional chunks
+    chunks = _np.nditer([val, unc, None],
+                        flags=['external_loop', 'buffered', 'zerosize_ok'],
+                        op_flags=[['readonly'], ['readonly'],
+                                  ['writeonly', 'allocate']],
+                        buffersize=_ENCODE_CHUNK_BYTES // val_type.itemsize)
+    with chunks:
+        for val_chunk, unc_chunk, val_enc_chunk in chunks:
+            _encode_chunk(val_chunk, unc_chunk, val_enc_chunk, consts)
+        return chunks.operands[2]
 
 
 def uncertainty_bound(val_enc):
@@ -143,25 +280,30 @@ def uncertainty_bound(val_enc):
         >>> uncertainties = np.float64([0.1, 3, np.nan, np.inf])
         >>> values_encoded = sf.encode(values, uncertainties)
         >>> sf.uncertainty_bound(values_encoded)
-        array([0.0625, 2., nan, nan])
+        array([0.0625, 2., nan, nan], dtype=float32)
+
+        The byte order of the encoded values does not matter:
+
+        >>> sf.uncertainty_bound(values_encoded.astype('>f4'))
+        array([0.0625, 2., nan, nan], dtype='>f4')
 
     """
     val_type = _np_float_type(val_enc)
-    finfo = _np.finfo(val_type)
-    val_isnum = ~(_np.isnan(val_enc) | _np.isinf(val_enc))
-    unc_bnd = _np.nan * _np.ones(val_enc.shape)  # return NaN for NaN and inf
-    negative, exponent, significand = _decompose(val_enc[val_isnum])
-    if any(exponent == finfo.minexp - 1):  # subnormals (including zero)
+    consts = _float_consts(val_type)
+    # decompose all values at once; flat, so that 0-d input also gives arrays
+    negative, exponent, significand = _decompose(val_enc.reshape(-1))
+    if (exponent == consts.minexp - 1).any():  # subnormals (including zero)
         raise ValueError("Zero or subnormal value detected in input; "
                          "these cannot be generated under our convention.")
-    unc_exponent = exponent.astype(val_type)
-    b = significand != 0
-    unc_exponent[b] -= _np.array(finfo.nmant, val_type)
-    unc_exponent[b] += _np.log2(
-                          (significand[b] & -significand[b]).astype(val_type))
-            # for v & -v trick, see https://stackoverflow.com/questions/18806481
-    unc_bnd[val_isnum] = 2 * 2 ** unc_exponent
-    return unc_bnd
+    val_isnum = exponent != consts.maxexp  # NaN and inf have maximal exponent
+    unc_exponent = exponent  # a C int array, as ldexp needs
+    # setting the implicit bit makes a zero significand count nmant zeros
+    significand |= consts.mant_mask + 1
+    unc_exponent += _ctz(significand)
+    unc_exponent -= consts.nmant
+    unc_bnd = _np.full(exponent.shape, _np.nan, val_type)  # NaN for NaN & inf
+    _np.ldexp(val_type.type(2), unc_exponent, out=unc_bnd, where=val_isnum)
+    return unc_bnd.reshape(val_enc.shape)
 
 
 def inner_bounds(val_enc):
@@ -256,8 +398,7 @@ def greater_than(val_enc_lhs, val_enc_rhs):
         array([False, False,  True,  True], dtype=bool)
 
     """
-    return (outer_bounds(val_enc_lhs)['lower']
-            > outer_bounds(val_enc_rhs)['upper'])
+    return _lower_bound(val_enc_lhs, 5) > _upper_bound(val_enc_rhs, 5)
 
 
 def less_than(val_enc_lhs, val_enc_rhs):
@@ -291,10 +432,10 @@ def less_than(val_enc_lhs, val_enc_rhs):
         >>> values_perturbed_encoded
         array([3.40625, -1233., 4.34375, -1205.], dtype=float32)
         >>> sf.less_than(values_encoded, values_perturbed_encoded)
-        array([False, False, False, False], dtype=bool)
+        array([False, False,  True,  True], dtype=bool)
 
     """
-    return greater_than(val_enc_lhs, val_enc_rhs)
+    return greater_than(val_enc_rhs, val_enc_lhs)
 
 
 def incomparable(val_enc_lhs, val_enc_rhs):
@@ -331,8 +472,9 @@ def incomparable(val_enc_lhs, val_enc_rhs):
         array([True,  True, False, False], dtype=bool)
 
     """
-    return ~(greater_than(val_enc_rhs, val_enc_lhs) |
-             less_than(val_enc_lhs, val_enc_rhs))
+    lower_lhs, upper_lhs = _bounds_soa(val_enc_lhs, 5)
+    lower_rhs, upper_rhs = _bounds_soa(val_enc_rhs, 5)
+    return ~((lower_lhs > upper_rhs) | (lower_rhs > upper_lhs))
 
 
 def round_decimal(val_enc):
@@ -363,14 +505,17 @@ def round_decimal(val_enc):
         True
 
     """
-    val_type = _np_float_type(val_enc)
-    pair = _np.dtype([('value', val_type), ('uncertainty', val_type)])
     unc_bnd = uncertainty_bound(val_enc)
+    val_type = unc_bnd.dtype  # uncertainty_bound checked val_enc's type
+    pair = _np.dtype([('value', val_type), ('uncertainty', val_type)])
     val_unc = _np.empty(val_enc.shape, pair)
     val_unc['uncertainty'] = unc_bnd
-    dec_unc_bnd = 10 ** _np.floor(_np.log10(unc_bnd))
+    # the bounds are powers of two, so ⌊log10⌋ follows from their exponent;
+    # decimal rounding is done in double precision, as before
+    unc_exponent = _np.frexp(unc_bnd)[1] - 1
+    dec_unc_bnd = _POW10[_floor_log10_pow2(unc_exponent) - _POW10_MIN]
     # we will not change NaN or infinity
-    val_isnum = ~(_np.isnan(val_enc) | _np.isinf(val_enc))
+    val_isnum = _np.isfinite(val_enc)
     val_unc['value'] = _np.where(val_isnum,
                                  _np.round(val_enc / dec_unc_bnd) * dec_unc_bnd,
                                  val_enc)